@@ -1,4 +1,7 @@
+import ipaddress
 import json
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -7,10 +10,15 @@ import plotly.express as px
 import pydeck as pdk
 import requests
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 try:
     from streamlit_geolocation import geolocation
 except ImportError:
     geolocation = None
+try:
+    import maxminddb
+except ImportError:
+    maxminddb = None
 
 
 # -------------------------------------------------------------------
@@ -163,11 +171,192 @@ def fetch_fallback_open_meteo(city: str, units: str) -> Optional[Dict[str, Any]]
         return None
 
 
+# -------------------------------------------------------------------
+# IP geolocation (per client)
+# -------------------------------------------------------------------
+DEFAULT_GEOIP_DB = "GeoLite2-City.mmdb"
+GEOIP_CACHE_SIZE = 4096
+GEOIP_ERRORS: Tuple[type, ...] = (OSError, ValueError)
+if maxminddb is not None:
+    GEOIP_ERRORS += (maxminddb.InvalidDatabaseError,)
+
+
+def parse_bool(value: Any) -> bool:
+    """Parse a secrets value ("true"/"false", 1/0, bool) into a bool."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def get_geoip_settings() -> Dict[str, Any]:
+    """Return GeoIP settings from secrets, with defaults."""
+    try:
+        conf = dict(st.secrets["geoip"])
+    except (KeyError, FileNotFoundError):
+        conf = {}
+    try:
+        trusted_proxies = max(int(conf.get("trusted_proxies", 0)), 0)
+    except (TypeError, ValueError):
+        trusted_proxies = 0
+    return {
+        "database": conf.get("database", DEFAULT_GEOIP_DB),
+        "ipinfo_fallback": parse_bool(conf.get("ipinfo_fallback", False)),
+        "trusted_proxies": trusted_proxies,
+    }
+
+
+def get_forwarded_for() -> List[str]:
+    """Return every X-Forwarded-For header line of the current request."""
+    try:
+        return st.context.headers.get_all("X-Forwarded-For")
+    except Exception:
+        return []
+
+
+def resolve_client_ip(forwarded_for: List[str], remote: Optional[str], trusted_proxies: int) -> Optional[str]:
+    """Pick the client IP given the number of trusted reverse proxies.
+
+    Each trusted proxy appends the address it received the request from to
+    X-Forwarded-For (either to the existing line or as a new header line, so
+    all lines are joined in order), and the client is the entry
+    ``trusted_proxies`` hops from the right. Anything further left is
+    client-controlled and ignored. With no trusted proxies the connection
+    address is used as-is.
+    """
+    if trusted_proxies <= 0:
+        candidate = remote
+    else:
+        hops = [part.strip() for part in ",".join(forwarded_for).split(",") if part.strip()]
+        if len(hops) < trusted_proxies:
+            return None
+        candidate = hops[-trusted_proxies]
+    if not candidate:
+        return None
+    try:
+        addr = ipaddress.ip_address(candidate)
+    except ValueError:
+        return None
+    if addr.version == 6 and addr.ipv4_mapped:
+        addr = addr.ipv4_mapped
+    return str(addr)
+
+
+def get_client_ip(trusted_proxies: int) -> Optional[str]:
+    """Resolve the requesting client's IP for the current session."""
+    context = getattr(st, "context", None)
+    remote = getattr(context, "ip_address", None)
+    if remote is None and context is not None and get_script_run_ctx() is not None:
+        # Streamlit은 루프백 접속(로컬 실행)의 ip_address를 None으로 돌려준다
+        remote = "127.0.0.1"
+    return resolve_client_ip(get_forwarded_for(), remote, trusted_proxies)
+
+
+def ip_network_of(ip: str, prefix_len: int) -> str:
+    """Return the network of ``ip`` with the given prefix length."""
+    return str(ipaddress.ip_network(f"{ip}/{prefix_len}", strict=False))
+
+
+@st.cache_resource(show_spinner=False)
+def open_geoip_reader(path: str) -> Optional[Any]:
+    """Open the local GeoIP database memory-mapped (None if unavailable)."""
+    if maxminddb is None:
+        return None
+    try:
+        return maxminddb.open_database(path, maxminddb.MODE_MMAP)
+    except GEOIP_ERRORS:
+        return None
+
+
+class GeoIPNetworkCache:
+    """Thread-safe LRU keyed by the network the GeoIP database returned."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[Tuple[str, str], Optional[Dict[str, Any]]]" = OrderedDict()
+        # (path, ip version, prefix length) -> number of cached networks
+        self.prefix_lens: Dict[Tuple[str, int, int], int] = {}
+        self.lock = threading.Lock()
+
+    def get(self, path: str, ip: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Return (hit, location) for the cached network containing ``ip``."""
+        version = ipaddress.ip_address(ip).version
+        with self.lock:
+            lens = sorted((n for (p, v, n) in self.prefix_lens if p == path and v == version), reverse=True)
+            for prefix_len in lens:
+                key = (path, ip_network_of(ip, prefix_len))
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    return True, self.entries[key]
+        return False, None
+
+    def put(self, path: str, network: str, location: Optional[Dict[str, Any]]) -> None:
+        """Store a result for ``network`` and evict the least recently used."""
+        key = (path, network)
+        with self.lock:
+            if key not in self.entries:
+                self._count(key, 1)
+            self.entries[key] = location
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                old_key, _ = self.entries.popitem(last=False)
+                self._count(old_key, -1)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _count(self, key: Tuple[str, str], delta: int) -> None:
+        net = ipaddress.ip_network(key[1])
+        len_key = (key[0], net.version, net.prefixlen)
+        count = self.prefix_lens.get(len_key, 0) + delta
+        if count:
+            self.prefix_lens[len_key] = count
+        else:
+            self.prefix_lens.pop(len_key, None)
+
+
+@st.cache_resource(show_spinner=False)
+def get_geoip_network_cache() -> GeoIPNetworkCache:
+    """Process-wide LRU of GeoIP results keyed by database network."""
+    return GeoIPNetworkCache(GEOIP_CACHE_SIZE)
+
+
+def to_location(record: Any) -> Optional[Dict[str, Any]]:
+    """Normalize a GeoIP City record into the location dict used by the UI."""
+    if not isinstance(record, dict) or "location" not in record:
+        return None
+    location = record["location"]
+    if location.get("latitude") is None or location.get("longitude") is None:
+        return None
+    subdivisions = record.get("subdivisions") or [{}]
+    return {
+        "city": record.get("city", {}).get("names", {}).get("en"),
+        "region": subdivisions[0].get("names", {}).get("en"),
+        "country": record.get("country", {}).get("iso_code"),
+        "lat": float(location["latitude"]),
+        "lon": float(location["longitude"]),
+    }
+
+
+def lookup_geoip(reader: Any, cache: GeoIPNetworkCache, path: str, ip: str) -> Optional[Dict[str, Any]]:
+    """Look up ``ip`` in the GeoIP database through the network LRU."""
+    hit, location = cache.get(path, ip)
+    if hit:
+        return location
+    try:
+        record, prefix_len = reader.get_with_prefix_len(ip)
+    except GEOIP_ERRORS:
+        return None
+    location = to_location(record)
+    cache.put(path, ip_network_of(ip, prefix_len), location)
+    return location
+
+
 @st.cache_data(ttl=600, show_spinner=False)
-def detect_location_by_ip() -> Optional[Dict[str, Any]]:
-    """Detect approximate location via IP."""
+def fetch_location_ipinfo(ip: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Fallback IP location via ipinfo.io (network call)."""
     try:
-        res = requests.get("https://ipinfo.io/json", timeout=10)
+        url = f"https://ipinfo.io/{ip}/json" if ip else "https://ipinfo.io/json"
+        res = requests.get(url, timeout=10)
         if res.status_code != 200:
             return None
         data = res.json()
@@ -185,6 +374,28 @@ def detect_location_by_ip() -> Optional[Dict[str, Any]]:
         return None
 
 
+def detect_location_by_ip() -> Optional[Dict[str, Any]]:
+    """Detect the requesting client's approximate location via IP."""
+    settings = get_geoip_settings()
+    client_ip = get_client_ip(settings["trusted_proxies"])
+    if not client_ip:
+        return None
+    reader = open_geoip_reader(settings["database"])
+    if reader is not None:
+        location = lookup_geoip(reader, get_geoip_network_cache(), settings["database"], client_ip)
+        if location:
+            return location
+    if not settings["ipinfo_fallback"]:
+        return None
+    addr = ipaddress.ip_address(client_ip)
+    if addr.is_loopback:
+        # 로컬 실행: 서버와 클라이언트가 같은 머신이므로 서버 출발지 IP로 조회
+        return fetch_location_ipinfo(None)
+    if not addr.is_global:
+        return None
+    return fetch_location_ipinfo(client_ip)
+
+
 # -------------------------------------------------------------------
 # Sidebar
 # -------------------------------------------------------------------